@@ -4,10 +4,12 @@ Baseline Financial Assistant - Simple prompting without explicit reasoning (Loca
 
 import os
 from dotenv import load_dotenv
-from langchain_ollama import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+import asyncio
+import logging
+import re
 import sys
 from pathlib import Path
 
@@ -16,7 +18,17 @@ load_dotenv()
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
-from tools.ssb_tools import get_average_spending_by_category
+from tools.ssb_tools import find_categories, get_spending
+from utils.llm import DEFAULT_MODEL, create_chat_model
+from utils.semantic_cache import SemanticCache
+
+_WORD_RE = re.compile(r'[a-z]+')
+_NUMBER_RE = re.compile(r'\d[\d,.]*')
+
+# Plain "how much is spent on X" questions, answered straight from the SSB tool
+_IS_SIMPLE_LOOKUP = re.compile(r'\b(how much|average|spending)\b')
+# Numbers, percentages, comparisons and totals need the LLM to reason over the lookup
+_NEEDS_REASONING = re.compile(r'\d|%|\b(percent\w*|compar\w*|above|below|ratio|if|total)\b')
 
 
 class BaselineAgent:
@@ -25,12 +37,19 @@ class BaselineAgent:
     Runs locally with Ollama (no API key needed).
     """
 
-    def __init__(self, model_name: str = "llama3.2"):
-        """Initialize local Llama model via Ollama"""
-        self.llm = ChatOllama(
-            model=model_name,
-            temperature=0
-        )
+    def __init__(self, model_name: str = DEFAULT_MODEL, warmup: bool = True, fast_path: bool = True,
+                 semantic_cache: bool = True):
+        """
+        Initialize local Llama model via Ollama (preloaded unless warmup=False)
+
+        With fast_path=True, simple single-category lookups return the SSB tool
+        result directly instead of running the LLM. With semantic_cache=True,
+        LLM answers are reused for near-duplicate questions about the same
+        SSB categories.
+        """
+        self.llm = create_chat_model(model_name, warmup=warmup)
+        self.fast_path = fast_path
+        self.semantic_cache = SemanticCache() if semantic_cache else None
 
         # Prompt template
         self.prompt = ChatPromptTemplate.from_messages([
@@ -50,42 +69,118 @@ Always cite Statistics Norway (SSB) as your source when giving numbers."""),
         # Combine prompt + model + parser
         self.chain = self.prompt | self.llm | StrOutputParser()
 
-    def answer_question(self, question: str) -> Dict[str, Any]:
-        """Answer a financial question using local LLM"""
-        categories = [
-            "housing", "food", "transport", "entertainment",
-            "clothing", "health", "communication", "restaurants"
-        ]
-
-        question_lower = question.lower()
-        found_category = next((cat for cat in categories if cat in question_lower), None)
-
-        # Try to fetch data from SSB tool
-        tool_result = ""
-        if found_category:
-            tool_result = get_average_spending_by_category.invoke({"category": found_category})
-
-        # Enrich question with retrieved data
-        enhanced_question = question
-        if tool_result:
-            enhanced_question = f"""Question: {question}
+    def _find_categories(self, question: str) -> List[str]:
+        """Known category terms mentioned in the question, one per SSB category, in question order"""
+        return list(find_categories(_WORD_RE.findall(question.lower())).values())
+
+    def _is_simple_lookup(self, question: str, categories: List[str], tool_result: str) -> bool:
+        """Plain single-category "how much" question with a successful (cited) tool result"""
+        question = question.lower()
+        return (self.fast_path
+                and len(categories) == 1
+                and "Source: Statistics Norway" in tool_result
+                and _IS_SIMPLE_LOOKUP.search(question) is not None
+                and _NEEDS_REASONING.search(question) is None)
+
+    def _enhance_question(self, question: str, tool_result: str) -> str:
+        """Enrich question with retrieved data"""
+        if not tool_result:
+            return question
+        return f"""Question: {question}
 
 Relevant data from Statistics Norway: {tool_result}
 
 Please answer the question using this data and cite SSB as the source."""
 
-        # Run model
-        answer = self.chain.invoke({"question": enhanced_question})
-
+    def _result(self, question: str, answer: str, found_category, tool_result: str,
+                model: str = "baseline (Ollama Llama3.2)") -> Dict[str, Any]:
         return {
             "question": question,
             "answer": answer,
             "tool_used": bool(found_category),
             "tool_result": tool_result or None,
             "reasoning_steps": [],
-            "model": "baseline (Ollama Llama3.2)"
+            "model": model
         }
 
+    def _cache_key(self, question: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """
+        SSB codes of the categories and the numbers in the question, so
+        different topics or figures (50,000 vs 80,000 NOK) never share answers
+        """
+        question = question.lower()
+        codes = tuple(find_categories(_WORD_RE.findall(question)))
+        numbers = tuple(number.rstrip('.,').replace(',', '') for number in _NUMBER_RE.findall(question))
+        return codes, numbers
+
+    def _cached_answer(self, embedding, question: str):
+        """Answer from the semantic cache, if a similar question was seen"""
+        if embedding is None:
+            return None
+        cached = self.semantic_cache.get(embedding, self._cache_key(question))
+        return {**cached, "question": question} if cached is not None else None
+
+    def _remember(self, embedding, question: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        if embedding is not None:
+            self.semantic_cache.put(embedding, self._cache_key(question), result)
+        return result
+
+    def answer_question(self, question: str) -> Dict[str, Any]:
+        """Answer a financial question using local LLM"""
+        categories = self._find_categories(question)
+        found_category = categories[0] if categories else None
+
+        # Try to fetch data from SSB tool
+        tool_result = ""
+        if found_category:
+            tool_result = get_spending(found_category)
+
+        if self._is_simple_lookup(question, categories, tool_result):
+            return self._result(question, tool_result, found_category, tool_result,
+                                model="baseline (rule-fast-path)")
+
+        # Only questions that need the LLM pay for embedding them
+        embedding = self.semantic_cache.embed(question) if self.semantic_cache else None
+        cached = self._cached_answer(embedding, question)
+        if cached is not None:
+            return cached
+
+        # Run model
+        answer = self.chain.invoke({"question": self._enhance_question(question, tool_result)})
+
+        return self._remember(embedding, question,
+                              self._result(question, answer, found_category, tool_result))
+
+    async def aanswer_question(self, question: str) -> Dict[str, Any]:
+        """Async variant of answer_question (SSB lookup and embedding run in worker threads)"""
+        categories = self._find_categories(question)
+        found_category = categories[0] if categories else None
+
+        tool_result = ""
+        if found_category:
+            tool_result = await asyncio.to_thread(get_spending, found_category)
+
+        if self._is_simple_lookup(question, categories, tool_result):
+            return self._result(question, tool_result, found_category, tool_result,
+                                model="baseline (rule-fast-path)")
+
+        embedding = None
+        if self.semantic_cache:
+            embedding = await asyncio.to_thread(self.semantic_cache.embed, question)
+        cached = self._cached_answer(embedding, question)
+        if cached is not None:
+            return cached
+
+        answer = await self.chain.ainvoke({"question": self._enhance_question(question, tool_result)})
+
+        return self._remember(embedding, question,
+                              self._result(question, answer, found_category, tool_result))
+
+
+async def _answer_all(agent: BaselineAgent, questions: List[str]) -> List[Dict[str, Any]]:
+    """Answer several questions concurrently"""
+    return await asyncio.gather(*[agent.aanswer_question(q) for q in questions])
+
 
 def test_baseline():
     """Quick test for the baseline agent"""
@@ -99,9 +194,10 @@ def test_baseline():
         "Do Norwegians spend more on housing or food?",
     ]
 
-    for i, question in enumerate(questions, 1):
+    # Questions only overlap if the Ollama server runs with OLLAMA_NUM_PARALLEL > 1
+    results = asyncio.run(_answer_all(agent, questions))
+    for i, (question, result) in enumerate(zip(questions, results), 1):
         print(f"📝 Question {i}: {question}")
-        result = agent.answer_question(question)
         print(f"💡 Answer: {result['answer']}")
         print(f"🔧 Used tool: {result['tool_used']}")
         if result['tool_result']:
@@ -112,4 +208,5 @@ def test_baseline():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
     test_baseline()
@@ -5,43 +5,128 @@ Implements ReAct loop manually without complex LangChain abstractions
 
 import os
 from dotenv import load_dotenv
-from langchain_ollama import ChatOllama
-from typing import Dict, Any, List
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from typing import Dict, Any, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import re
+import asyncio
+import logging
 from pathlib import Path
 
 load_dotenv()
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
+# Plain functions behind the SSB tools: the agent calls them directly, which
+# skips LangChain's BaseTool.invoke validation and callback setup per call
 from tools.ssb_tools import (
-    get_average_spending_by_category,
-    compare_spending_categories,
-    get_total_household_spending
+    get_spending,
+    compare_spending,
+    get_total_spending
 )
+from utils.llm import DEFAULT_MODEL, create_chat_model
+
+
+# Compiled once at import; these run on every LLM turn
+_ACTION_RE = re.compile(r'ACTION:\s*(\w+)\((.*?)\)', re.IGNORECASE)
+_FINAL_RE = re.compile(r'FINAL ANSWER:?\s*(.+)', re.IGNORECASE | re.DOTALL)
+
+# Structural boundaries where an LLM turn ends: the model must not write its own
+# OBSERVATION or start a new THOUGHT before the tools have run
+_STOP_SEQUENCES = ["\nOBSERVATION:", "\nTHOUGHT:"]
+_MAX_STOP_LEN = max(len(stop) for stop in _STOP_SEQUENCES)
+
+# Shared pool for running independent ACTIONs of one turn concurrently
+_TOOL_POOL = ThreadPoolExecutor(max_workers=4)
+
+SYSTEM_PROMPT = """You are a helpful Norwegian financial assistant using Statistics Norway data.
+
+Answer questions using this EXACT format:
+
+THOUGHT: [explain what you need to know]
+ACTION: tool_name("argument")
+[wait for observation]
+
+If you need several independent lookups, write one ACTION line for each
+after the same THOUGHT. All their observations come back together.
+
+Available tools:
+- get_spending("category") - get spending for a category like "housing", "food", etc.
+- compare_spending("category1", "category2") - compare two categories
+- get_total_spending() - get total household spending
+
+After getting observations, provide:
+FINAL ANSWER: [your complete answer with sources]
+
+Be concise. Use tools to get data before answering."""
+
+
+class _TurnBuffer:
+    """
+    Streamed chunks of one LLM turn, collected in linear time
+
+    Chunks are kept in a list and joined once at the end; only the last few
+    characters are re-scanned for a stop sequence on each new chunk.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._length = 0
+        self._tail = ""
+        self._end = None
+
+    def feed(self, text: str) -> bool:
+        """Add a chunk; returns True once a stop boundary has been reached"""
+        window = self._tail + text
+        window_start = self._length - len(self._tail)
+        self._parts.append(text)
+        self._length += len(text)
+        cuts = [i for i in (window.find(stop) for stop in _STOP_SEQUENCES) if i != -1]
+        if cuts:
+            self._end = window_start + min(cuts)
+            return True
+        self._tail = window[-_MAX_STOP_LEN:]
+        return False
+
+    def text(self) -> str:
+        """The turn's text, cut at the stop boundary if one was reached"""
+        return "".join(self._parts)[:self._end]
 
 
 class SimpleReactAgent:
     """Manual ReAct agent implementation"""
     
-    def __init__(self, model_name: str = "llama3.2"):
-        self.llm = ChatOllama(model=model_name, temperature=0)
+    def __init__(self, model_name: str = DEFAULT_MODEL, warmup: bool = True, verbose: bool = False):
+        # verbose prints the full reasoning trace of both answer paths to stdout
+        self.verbose = verbose
+        # Ollama stops generating at the stop sequences server-side
+        self.llm = create_chat_model(model_name, warmup=warmup, stop=_STOP_SEQUENCES)
         self.tools = {
-            "get_spending": get_average_spending_by_category,
-            "compare_spending": compare_spending_categories,
-            "get_total_spending": get_total_household_spending
+            "get_spending": get_spending,
+            "compare_spending": compare_spending,
+            "get_total_spending": get_total_spending
         }
         self.max_iterations = 5
 
-    def _parse_action(self, text: str) -> tuple:
-        action_match = re.search(r'ACTION:\s*(\w+)\((.*?)\)', text, re.IGNORECASE)
-        if action_match:
-            tool_name = action_match.group(1).lower()
-            args_str = action_match.group(2).strip('\'"')
+    def _parse_actions(self, text: str) -> List[Tuple[str, List[str]]]:
+        """All ACTION calls in an LLM turn, in the order they were written"""
+        actions = []
+        for tool_name, args_str in _ACTION_RE.findall(text):
+            args_str = args_str.strip('\'"')
             args = [arg.strip().strip('\'"') for arg in args_str.split(',')]
-            return tool_name, args
-        return None, None
+            actions.append((tool_name.lower(), args))
+        return actions
+
+    def _format_action(self, actions: List[Tuple[str, List[str]]]) -> str:
+        return "; ".join(f"{tool_name}({args})" for tool_name, args in actions)
+
+    def _format_observation(self, actions: List[Tuple[str, List[str]]], results: List[str]) -> str:
+        """Join per-action results into one observation, keeping the ACTION order"""
+        if len(results) == 1:
+            return results[0]
+        return "\n".join(f"{tool_name}({', '.join(args)}): {result}"
+                         for (tool_name, args), result in zip(actions, results))
 
     def _call_tool(self, tool_name: str, args: List[str]) -> str:
         tool_mapping = {
@@ -58,119 +143,183 @@ class SimpleReactAgent:
         tool = self.tools[mapped_tool]
         try:
             if mapped_tool == "get_spending":
-                result = tool.invoke({"category": args[0], "year": "2012"})
+                result = tool(args[0], "2012")
             elif mapped_tool == "compare_spending":
-                result = tool.invoke({
-                    "category1": args[0],
-                    "category2": args[1] if len(args) > 1 else "food",
-                    "year": "2012"
-                })
+                result = tool(args[0], args[1] if len(args) > 1 else "food", "2012")
             else:
-                result = tool.invoke({"year": "2012"})
+                result = tool("2012")
             return result
         except Exception as e:
             return f"Error calling tool: {str(e)}"
 
-    def answer_question(self, question: str) -> Dict[str, Any]:
-        print(f"\n{'='*80}")
-        print(f"🤔 REACT AGENT REASONING...")
-        print(f"{'='*80}\n")
+    def _trace(self, text: str):
+        if self.verbose:
+            print(text)
 
-        conversation_history = []
-        reasoning_steps = []
-        system_prompt = """You are a helpful Norwegian financial assistant using Statistics Norway data.
+    def _initial_messages(self, question: str) -> List[BaseMessage]:
+        # SYSTEM_PROMPT is a constant and later turns are only appended, so
+        # Ollama can reuse the KV cache for the whole prefix on each call
+        return [
+            SystemMessage(SYSTEM_PROMPT),
+            HumanMessage(f"Question: {question}\n\nLet's think step by step:"),
+        ]
 
-Answer questions using this EXACT format:
+    def _generate(self, messages: List[BaseMessage]) -> str:
+        """Stream one LLM turn, stopping early at a structural boundary"""
+        buffer = _TurnBuffer()
+        for chunk in self.llm.stream(messages):
+            if buffer.feed(chunk.content):
+                break
+        return buffer.text()
 
-THOUGHT: [explain what you need to know]
-ACTION: tool_name("argument")
-[wait for observation]
-
-Available tools:
-- get_spending("category") - get spending for a category like "housing", "food", etc.
-- compare_spending("category1", "category2") - compare two categories
-- get_total_spending() - get total household spending
-
-After getting observations, provide:
-FINAL ANSWER: [your complete answer with sources]
+    async def _agenerate(self, messages: List[BaseMessage]) -> str:
+        """Async variant of _generate"""
+        buffer = _TurnBuffer()
+        async for chunk in self.llm.astream(messages):
+            if buffer.feed(chunk.content):
+                break
+        return buffer.text()
 
-Be concise. Use tools to get data before answering."""
+    def _extract_final_answer(self, llm_output: str):
+        if "FINAL ANSWER" in llm_output.upper():
+            final_match = _FINAL_RE.search(llm_output)
+            if final_match:
+                return final_match.group(1).strip()
+        return None
 
-        current_question = f"Question: {question}"
+    def _record_observation(self, iteration: int, llm_output: str,
+                            actions: List[Tuple[str, List[str]]], observation,
+                            messages: List[BaseMessage], conversation_history: List[str],
+                            reasoning_steps: List[Dict[str, Any]]):
+        if actions:
+            conversation_history.append(f"OBSERVATION: {observation}")
+            messages.append(HumanMessage(f"OBSERVATION: {observation}\n\nContinue reasoning:"))
+            reasoning_steps.append({
+                "iteration": iteration + 1,
+                "thought": llm_output,
+                "action": self._format_action(actions),
+                "observation": observation
+            })
+        else:
+            messages.append(HumanMessage("Continue reasoning:"))
+            reasoning_steps.append({
+                "iteration": iteration + 1,
+                "thought": llm_output,
+                "action": None,
+                "observation": None
+            })
 
-        for iteration in range(self.max_iterations):
-            print(f"--- Iteration {iteration + 1} ---\n")
-            if iteration == 0:
-                prompt_text = f"{system_prompt}\n\n{current_question}\n\nLet's think step by step:"
-            else:
-                prompt_text = f"{system_prompt}\n\n{current_question}\n\n"
-                prompt_text += "\n".join(conversation_history)
-                prompt_text += "\n\nContinue reasoning:"
-            response = self.llm.invoke(prompt_text)
-            llm_output = response.content if hasattr(response, 'content') else str(response)
-            print(f"🧠 LLM Output:\n{llm_output}\n")
-            conversation_history.append(llm_output)
-
-            if "FINAL ANSWER" in llm_output.upper():
-                final_match = re.search(r'FINAL ANSWER:?\s*(.+)', llm_output, re.IGNORECASE | re.DOTALL)
-                if final_match:
-                    final_answer = final_match.group(1).strip()
-                    print(f"{'='*80}")
-                    print(f"✅ REACHED FINAL ANSWER")
-                    print(f"{'='*80}\n")
-                    return {
-                        "question": question,
-                        "answer": final_answer,
-                        "reasoning_steps": reasoning_steps,
-                        "conversation_history": conversation_history,
-                        "iterations": iteration + 1,
-                        "model": "react_simple (Ollama Llama3.2)"
-                    }
-
-            tool_name, args = self._parse_action(llm_output)
-            if tool_name and args:
-                print(f"🔧 Executing: {tool_name}({args})\n")
-                observation = self._call_tool(tool_name, args)
-                print(f"📊 OBSERVATION:\n{observation}\n")
-                conversation_history.append(f"OBSERVATION: {observation}")
-                reasoning_steps.append({
-                    "iteration": iteration + 1,
-                    "thought": llm_output,
-                    "action": f"{tool_name}({args})",
-                    "observation": observation
-                })
-            else:
-                reasoning_steps.append({
-                    "iteration": iteration + 1,
-                    "thought": llm_output,
-                    "action": None,
-                    "observation": None
-                })
-
-        print(f"⚠️ Max iterations reached\n")
+    def _result(self, question: str, answer: str, reasoning_steps, conversation_history,
+                iterations: int) -> Dict[str, Any]:
         return {
             "question": question,
-            "answer": "Could not reach final answer within iteration limit",
+            "answer": answer,
             "reasoning_steps": reasoning_steps,
             "conversation_history": conversation_history,
-            "iterations": self.max_iterations,
+            "iterations": iterations,
             "model": "react_simple (Ollama Llama3.2)"
         }
 
+    def _run_tools(self, actions: List[Tuple[str, List[str]]]) -> List[str]:
+        return list(_TOOL_POOL.map(lambda action: self._call_tool(*action), actions))
+
+    async def _arun_tools(self, actions: List[Tuple[str, List[str]]]) -> List[str]:
+        # SSB tools are blocking (HTTP), keep them off the event loop
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(_TOOL_POOL, self._call_tool, tool_name, args)
+            for tool_name, args in actions
+        ])
+
+    def _react_loop(self, question: str):
+        """
+        ReAct loop shared by answer_question and aanswer_question
+
+        A generator that yields ("llm", messages) and ("tools", actions)
+        requests; the caller runs them (sync or async) and sends back the
+        LLM output or tool results. Returns the result dictionary.
+        """
+        self._trace(f"\n{'='*80}")
+        self._trace(f"🤔 REACT AGENT REASONING: {question}")
+        self._trace(f"{'='*80}\n")
+
+        messages = self._initial_messages(question)
+        conversation_history = []
+        reasoning_steps = []
+
+        for iteration in range(self.max_iterations):
+            self._trace(f"--- Iteration {iteration + 1} ---\n")
+            llm_output = yield "llm", messages
+            messages.append(AIMessage(llm_output))
+            self._trace(f"🧠 LLM Output:\n{llm_output}\n")
+            conversation_history.append(llm_output)
+
+            final_answer = self._extract_final_answer(llm_output)
+            if final_answer is not None:
+                self._trace(f"{'='*80}")
+                self._trace(f"✅ REACHED FINAL ANSWER")
+                self._trace(f"{'='*80}\n")
+                return self._result(question, final_answer, reasoning_steps,
+                                    conversation_history, iteration + 1)
+
+            actions = self._parse_actions(llm_output)
+            observation = None
+            if actions:
+                self._trace(f"🔧 Executing: {self._format_action(actions)}\n")
+                results = yield "tools", actions
+                observation = self._format_observation(actions, results)
+                self._trace(f"📊 OBSERVATION:\n{observation}\n")
+            self._record_observation(iteration, llm_output, actions, observation,
+                                     messages, conversation_history, reasoning_steps)
+
+        self._trace(f"⚠️ Max iterations reached\n")
+        return self._result(question, "Could not reach final answer within iteration limit",
+                            reasoning_steps, conversation_history, self.max_iterations)
+
+    def answer_question(self, question: str) -> Dict[str, Any]:
+        steps = self._react_loop(question)
+        try:
+            kind, payload = next(steps)
+            while True:
+                reply = self._generate(payload) if kind == "llm" else self._run_tools(payload)
+                kind, payload = steps.send(reply)
+        except StopIteration as done:
+            return done.value
+
+    async def aanswer_question(self, question: str) -> Dict[str, Any]:
+        """Async variant of answer_question: awaits the LLM and runs tools in worker threads"""
+        steps = self._react_loop(question)
+        try:
+            kind, payload = next(steps)
+            while True:
+                if kind == "llm":
+                    reply = await self._agenerate(payload)
+                else:
+                    reply = await self._arun_tools(payload)
+                kind, payload = steps.send(reply)
+        except StopIteration as done:
+            return done.value
+
+
+async def _answer_all(agent: SimpleReactAgent, questions: List[str]) -> List[Dict[str, Any]]:
+    """Answer several questions concurrently"""
+    return await asyncio.gather(*[agent.aanswer_question(q) for q in questions])
+
 
 def test_simple_react():
     """Test the simple ReAct agent"""
     print("🧪 Testing Simple ReAct Agent\n")
-    agent = SimpleReactAgent()
+    agent = SimpleReactAgent(verbose=True)
     questions = [
         "How much do Norwegian families spend on housing?",
         "Do Norwegians spend more on housing or food?",
     ]
-    for i, question in enumerate(questions, 1):
+    # Questions only overlap if the Ollama server runs with OLLAMA_NUM_PARALLEL > 1
+    results = asyncio.run(_answer_all(agent, questions))
+    for i, (question, result) in enumerate(zip(questions, results), 1):
         print(f"\n{'#'*80}")
         print(f"# QUESTION {i}: {question}")
         print(f"{'#'*80}")
-        result = agent.answer_question(question)
         print(f"\n{'='*80}")
         print(f"📝 FINAL ANSWER:")
         print(f"{'='*80}")
@@ -181,4 +330,5 @@ def test_simple_react():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
     test_simple_react()
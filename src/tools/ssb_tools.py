@@ -3,7 +3,11 @@ LangChain tools for interacting with SSB (Statistics Norway) data
 """
 
 from langchain.tools import tool
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from types import MappingProxyType
+import functools
+import logging
+import math
 import sys
 from pathlib import Path
 
@@ -11,12 +15,83 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 from utils.ssb_api import SSBApi
 
+logger = logging.getLogger(__name__)
+
 # Initialize SSB API
 ssb = SSBApi()
 
 # Most recent available year in SSB data
 DEFAULT_YEAR = "2012"
 
+# Mapping of common terms to SSB Forbruksundersok category codes
+# Based on actual SSB Table 10235 structure
+_CATEGORY_MAPPING: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "food": ("01",),  # Food and non-alcoholic beverages
+    "alcohol": ("02",),  # Alcoholic beverages and tobacco
+    "tobacco": ("02",),
+    "clothing": ("03",),  # Clothing and footwear
+    "clothes": ("03",),
+    "housing": ("04",),  # Housing, water, electricity, gas and other fuels
+    "home": ("04",),
+    "furnishings": ("05",),  # Furnishings, household equipment
+    "furniture": ("05",),
+    "health": ("06",),  # Health
+    "medical": ("06",),
+    "transport": ("07",),  # Transport
+    "transportation": ("07",),
+    "communication": ("08",),  # Communication
+    "phone": ("08",),
+    "entertainment": ("09",),  # Recreation and culture
+    "recreation": ("09",),
+    "culture": ("09",),
+    "education": ("10",),  # Education
+    "school": ("10",),
+    "restaurants": ("11",),  # Restaurants and hotels
+    "hotels": ("11",),
+    "dining": ("11",),
+    "other": ("12",),  # Miscellaneous goods and services
+    "miscellaneous": ("12",),
+})
+
+# Category terms agents look for in free-text questions. "home" and "other"
+# are too common in ordinary questions to signal a spending category.
+CATEGORIES = frozenset(term for term in _CATEGORY_MAPPING if term not in ("home", "other"))
+
+# Plural/derived endings accepted on a category term (e.g. "healthcare")
+_TERM_SUFFIXES = ("s", "es", "care")
+
+
+def category_term(word: str) -> Optional[str]:
+    """Category term a lowercase word refers to, accepting simple plural/derived forms"""
+    if word in CATEGORIES:
+        return word
+    for suffix in _TERM_SUFFIXES:
+        if word.endswith(suffix) and word[:-len(suffix)] in CATEGORIES:
+            return word[:-len(suffix)]
+    if word + "s" in CATEGORIES:
+        return word + "s"
+    return None
+
+
+def find_categories(words: Iterable[str]) -> Dict[str, str]:
+    """Category terms among lowercase words, keyed by SSB code, in first-seen order"""
+    found: Dict[str, str] = {}
+    for word in words:
+        term = category_term(word)
+        if term:
+            found.setdefault(_CATEGORY_MAPPING[term][0], term)
+    return found
+
+
+def get_spending(category: str, year: str = DEFAULT_YEAR) -> str:
+    """get_average_spending_by_category without the LangChain tool wrapper (for direct calls)"""
+    try:
+        return _average_spending(category.lower(), year)
+    except LookupError as e:
+        return str(e)
+    except Exception as e:
+        return f"Error retrieving data: {str(e)}"
+
 
 @tool
 def get_average_spending_by_category(category: str, year: str = DEFAULT_YEAR) -> str:
@@ -34,75 +109,54 @@ def get_average_spending_by_category(category: str, year: str = DEFAULT_YEAR) ->
         get_average_spending_by_category("housing", "2012")
         Returns: "Norwegian households spend an average of 11,332 NOK per month on housing"
     """
-    
-    # Mapping of common terms to SSB Forbruksundersok category codes
-    # Based on actual SSB Table 10235 structure
-    category_mapping = {
-        "food": ["01"],  # Food and non-alcoholic beverages
-        "alcohol": ["02"],  # Alcoholic beverages and tobacco
-        "tobacco": ["02"],
-        "clothing": ["03"],  # Clothing and footwear
-        "clothes": ["03"],
-        "housing": ["04"],  # Housing, water, electricity, gas and other fuels
-        "home": ["04"],
-        "furnishings": ["05"],  # Furnishings, household equipment
-        "furniture": ["05"],
-        "health": ["06"],  # Health
-        "medical": ["06"],
-        "transport": ["07"],  # Transport
-        "transportation": ["07"],
-        "communication": ["08"],  # Communication
-        "phone": ["08"],
-        "entertainment": ["09"],  # Recreation and culture
-        "recreation": ["09"],
-        "culture": ["09"],
-        "education": ["10"],  # Education
-        "school": ["10"],
-        "restaurants": ["11"],  # Restaurants and hotels
-        "hotels": ["11"],
-        "dining": ["11"],
-        "other": ["12"],  # Miscellaneous goods and services
-        "miscellaneous": ["12"],
-    }
-    
-    # Normalize category input
-    category_lower = category.lower()
-    
+    return get_spending(category, year)
+
+
+@functools.lru_cache(maxsize=512)
+def _average_spending(category: str, year: str) -> str:
+    """Memoized implementation of get_average_spending_by_category (category is lowercased)"""
     # Find matching category
-    ssb_codes = category_mapping.get(category_lower)
+    ssb_codes = _CATEGORY_MAPPING.get(category)
     
     if not ssb_codes:
-        available = ', '.join(sorted(set(category_mapping.keys())))
+        available = ', '.join(sorted(_CATEGORY_MAPPING))
         return f"Category '{category}' not recognized. Available categories: {available}"
     
-    try:
-        # Query SSB
-        data = ssb.get_household_budget_data(year=year, categories=ssb_codes)
-        
-        if not data:
-            return f"No data available for {category} in {year}"
-        
-        # Parse data
-        parsed = ssb.parse_household_data(data)
-        
-        if not parsed:
-            return f"Could not parse data for {category}"
-        
-        # Sum up all values in this category
-        total_annual = sum(item['value'] for item in parsed if item['value'] is not None)
-        total_monthly = total_annual / 12
-        
-        # Get category name from results
-        category_name = parsed[0]['category'] if parsed else category
-        
-        # Format response
-        return (f"Norwegian households spend an average of {total_monthly:,.0f} NOK per month "
-                f"on {category_name} ({total_annual:,.0f} NOK per year). "
-                f"Source: Statistics Norway Household Budget Survey {year}, Table 10235. "
-                f"URL: https://www.ssb.no/statbank/table/10235")
+    # All categories come from one shared, memoized SSB query
+    # (failures raise LookupError so they are not memoized)
+    data = ssb.get_all_categories(year)
+    
+    if not data:
+        raise LookupError(f"No data available for {category} in {year}")
+    
+    parsed = [data[code] for code in ssb_codes if code in data]
+    
+    if not parsed:
+        raise LookupError(f"Could not parse data for {category}")
+    
+    # Sum up all values in this category (fsum is exact, independent of order)
+    total_annual = math.fsum(item['value'] for item in parsed if item['value'] is not None)
+    total_monthly = total_annual / 12
     
+    # Get category name from results
+    category_name = parsed[0]['category'] if parsed else category
+    
+    # Format response
+    return (f"Norwegian households spend an average of {total_monthly:,.0f} NOK per month "
+            f"on {category_name} ({total_annual:,.0f} NOK per year). "
+            f"Source: Statistics Norway Household Budget Survey {year}, Table 10235. "
+            f"URL: https://www.ssb.no/statbank/table/10235")
+
+
+def compare_spending(category1: str, category2: str, year: str = DEFAULT_YEAR) -> str:
+    """compare_spending_categories without the LangChain tool wrapper (for direct calls)"""
+    try:
+        return _compare_spending(category1.lower(), category2.lower(), year)
+    except LookupError as e:
+        return str(e)
     except Exception as e:
-        return f"Error retrieving data: {str(e)}"
+        logger.warning("Error comparing categories: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
+        return f"Error comparing categories: {str(e)}"
 
 
 @tool
@@ -121,73 +175,78 @@ def compare_spending_categories(category1: str, category2: str, year: str = DEFA
     Example:
         compare_spending_categories("housing", "food", "2012")
     """
+    return compare_spending(category1, category2, year)
+
+
+@functools.lru_cache(maxsize=512)
+def _compare_spending(category1: str, category2: str, year: str) -> str:
+    """Memoized implementation of compare_spending_categories (categories are lowercased)"""
+    codes1 = _CATEGORY_MAPPING.get(category1)
+    codes2 = _CATEGORY_MAPPING.get(category2)
     
-    # Get data for both categories directly
-    category_mapping = {
-        "food": "01", "alcohol": "02", "tobacco": "02", "clothing": "03", 
-        "clothes": "03", "housing": "04", "home": "04", "furnishings": "05",
-        "furniture": "05", "health": "06", "medical": "06", "transport": "07",
-        "transportation": "07", "communication": "08", "phone": "08",
-        "entertainment": "09", "recreation": "09", "culture": "09",
-        "education": "10", "school": "10", "restaurants": "11", "hotels": "11",
-        "dining": "11", "other": "12", "miscellaneous": "12"
-    }
-    
-    code1 = category_mapping.get(category1.lower())
-    code2 = category_mapping.get(category2.lower())
-    
-    if not code1 or not code2:
+    if not codes1 or not codes2:
         return f"One or both categories not recognized: {category1}, {category2}"
     
-    try:
-        # Get both datasets
-        data = ssb.get_household_budget_data(year=year, categories=[code1, code2])
-        
-        if not data:
-            return f"No data available for comparison in {year}"
-        
-        parsed = ssb.parse_household_data(data)
-        
-        if len(parsed) < 2:
-            return "Could not get data for both categories"
-        
-        # Extract amounts
-        amounts = {}
-        for item in parsed:
-            code = item['category_code']
-            monthly = item['value'] / 12
-            amounts[code] = {
-                'amount': monthly,
-                'annual': item['value'],
-                'name': item['category']
-            }
-        
-        amt1 = amounts.get(code1)
-        amt2 = amounts.get(code2)
-        
-        if not amt1 or not amt2:
-            return "Could not parse amounts for comparison"
+    code1, code2 = codes1[0], codes2[0]
+    
+    if code1 == code2:
+        return (f"'{category1}' and '{category2}' are the same SSB category (code {code1}), "
+                f"so there is nothing to compare.")
+    
+    # Both categories come from the shared, memoized all-categories query,
+    # so comparisons after the first lookup need no further SSB requests
+    data = ssb.get_all_categories(year)
+    
+    if not data:
+        raise LookupError(f"No data available for comparison in {year}")
+    
+    parsed = [data[code] for code in (code1, code2) if code in data]
+    
+    if len(parsed) < 2:
+        raise LookupError("Could not get data for both categories")
+    
+    # Extract amounts
+    amounts = {}
+    for item in parsed:
+        code = item['category_code']
+        monthly = item['value'] / 12
+        amounts[code] = {
+            'amount': monthly,
+            'annual': item['value'],
+            'name': item['category']
+        }
+    
+    amt1 = amounts.get(code1)
+    amt2 = amounts.get(code2)
+    
+    if not amt1 or not amt2:
+        raise LookupError("Could not parse amounts for comparison")
+    
+    # Calculate ratio
+    if amt2['amount'] > 0:
+        ratio = amt1['amount'] / amt2['amount']
         
-        # Calculate ratio
-        if amt2['amount'] > 0:
-            ratio = amt1['amount'] / amt2['amount']
-            
-            if ratio > 1:
-                return (f"{amt1['name']} ({amt1['amount']:,.0f} NOK/month) costs "
-                       f"{ratio:.1f}x more than {amt2['name']} ({amt2['amount']:,.0f} NOK/month). "
-                       f"Source: SSB Table 10235 ({year})")
-            else:
-                ratio = amt2['amount'] / amt1['amount']
-                return (f"{amt2['name']} ({amt2['amount']:,.0f} NOK/month) costs "
-                       f"{ratio:.1f}x more than {amt1['name']} ({amt1['amount']:,.0f} NOK/month). "
-                       f"Source: SSB Table 10235 ({year})")
+        if ratio > 1:
+            return (f"{amt1['name']} ({amt1['amount']:,.0f} NOK/month) costs "
+                   f"{ratio:.1f}x more than {amt2['name']} ({amt2['amount']:,.0f} NOK/month). "
+                   f"Source: SSB Table 10235 ({year})")
         else:
-            return "Could not compare - one category has zero spending"
-            
+            ratio = amt2['amount'] / amt1['amount']
+            return (f"{amt2['name']} ({amt2['amount']:,.0f} NOK/month) costs "
+                   f"{ratio:.1f}x more than {amt1['name']} ({amt1['amount']:,.0f} NOK/month). "
+                   f"Source: SSB Table 10235 ({year})")
+    else:
+        return "Could not compare - one category has zero spending"
+
+
+def get_total_spending(year: str = DEFAULT_YEAR) -> str:
+    """get_total_household_spending without the LangChain tool wrapper (for direct calls)"""
+    try:
+        return _total_spending(year)
+    except LookupError as e:
+        return str(e)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return f"Error comparing categories: {str(e)}"
+        return f"Error calculating total spending: {str(e)}"
 
 
 @tool
@@ -201,33 +260,38 @@ def get_total_household_spending(year: str = DEFAULT_YEAR) -> str:
     Returns:
         String with total spending information
     """
+    return get_total_spending(year)
+
+
+@functools.lru_cache(maxsize=512)
+def _total_spending(year: str) -> str:
+    """Memoized implementation of get_total_household_spending"""
+    # All main categories (shared, memoized SSB query)
+    data = ssb.get_all_categories(year)
     
-    try:
-        # Query all main categories
-        data = ssb.get_household_budget_data(year=year)
-        
-        if not data:
-            return f"No data available for {year}"
-        
-        # Parse data
-        parsed = ssb.parse_household_data(data)
-        
-        if not parsed:
-            return "Could not parse household data"
-        
-        # Calculate total
-        total_annual = sum(item['value'] for item in parsed if item['value'] is not None)
-        total_monthly = total_annual / 12
-        
-        # Count categories
-        num_categories = len(parsed)
-        
-        return (f"Norwegian households spend an average of {total_monthly:,.0f} NOK per month "
-                f"({total_annual:,.0f} NOK per year) across {num_categories} main spending categories. "
-                f"Source: Statistics Norway Household Budget Survey {year}, Table 10235")
+    if not data:
+        raise LookupError(f"No data available for {year}")
     
-    except Exception as e:
-        return f"Error calculating total spending: {str(e)}"
+    parsed = list(data.values())
+    
+    # Calculate total (fsum is exact, independent of order)
+    total_annual = math.fsum(item['value'] for item in parsed if item['value'] is not None)
+    total_monthly = total_annual / 12
+    
+    # Count categories
+    num_categories = len(parsed)
+    
+    return (f"Norwegian households spend an average of {total_monthly:,.0f} NOK per month "
+            f"({total_annual:,.0f} NOK per year) across {num_categories} main spending categories. "
+            f"Source: Statistics Norway Household Budget Survey {year}, Table 10235")
+
+
+def clear_tool_cache():
+    """Drop memoized tool results and SSB categories (e.g. after refreshing the SSB cache)"""
+    ssb.refresh()
+    _average_spending.cache_clear()
+    _compare_spending.cache_clear()
+    _total_spending.cache_clear()
 
 
 # List of all tools for easy import
@@ -266,4 +330,5 @@ def test_tools():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
     test_tools()
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+Build the bundled SSB snapshot used by SSBApi.get_all_categories
+
+Fetches all main spending categories of Table 10235 for a year once and
+stores them under utils/snapshots/, so the default year never needs the API.
+
+Usage:
+    python build_ssb_snapshot.py [year]
+"""
+
+import sys
+import orjson
+from ssb_api import SSBApi
+
+
+def build_snapshot(year: str = "2012"):
+    """Fetch all main categories for a year and write them to the snapshot file"""
+    api = SSBApi(use_snapshot=False)
+    categories = api.get_all_categories(year)
+
+    if not categories:
+        print(f"❌ No data for {year}, snapshot not written")
+        return
+
+    path = SSBApi.snapshot_path(year)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(categories, option=orjson.OPT_INDENT_2))
+
+    print(f"✅ Saved {len(categories)} categories to {path}")
+
+
+if __name__ == "__main__":
+    build_snapshot(sys.argv[1] if len(sys.argv) > 1 else "2012")
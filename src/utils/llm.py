@@ -0,0 +1,40 @@
+"""
+Shared Ollama model setup for the agents
+"""
+
+import os
+import logging
+from langchain_ollama import ChatOllama
+
+logger = logging.getLogger(__name__)
+
+# Pinned explicitly to the build behind Ollama's default "llama3.2" tag
+# (3B instruct, Q4_K_M), so it cannot silently change; set OLLAMA_MODEL to override.
+DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:3b-instruct-q4_K_M")
+
+
+def create_chat_model(model_name: str = DEFAULT_MODEL, warmup: bool = True, **kwargs) -> ChatOllama:
+    """
+    Create a ChatOllama model that stays resident in the Ollama server
+
+    Args:
+        model_name: Ollama model tag (default: DEFAULT_MODEL)
+        warmup: Load the model now instead of on the first question
+        **kwargs: Extra ChatOllama parameters (e.g. stop sequences)
+
+    Returns:
+        Configured ChatOllama instance
+    """
+    # keep_alive=-1 keeps the model loaded between requests
+    llm = ChatOllama(model=model_name, temperature=0, keep_alive=-1, **kwargs)
+    if warmup:
+        _warmup(llm)
+    return llm
+
+
+def _warmup(llm: ChatOllama):
+    """Generate a single token so the model load happens up front"""
+    try:
+        llm.invoke("warmup", options={"num_predict": 1})
+    except Exception as e:
+        logger.warning("⚠️ Could not warm up %s: %s", llm.model, e)
@@ -0,0 +1,116 @@
+"""
+Semantic answer cache
+Reuses answers for questions that are worded differently but mean the same
+"""
+
+import logging
+import threading
+from typing import Any, Hashable, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """
+    In-process cache of answers keyed by question embeddings
+
+    Stored embeddings live in a flat NumPy matrix; a lookup is one matrix-vector
+    product (cosine similarity, as embeddings are normalized). Each entry also
+    has an exact-match key so that near-identical wording about different
+    things (e.g. housing vs food) never shares an answer. The least recently
+    used entry is evicted once max_size is reached.
+
+    If the embedding model cannot be loaded (sentence-transformers missing,
+    or no network to download it), the cache disables itself: embed()
+    returns None and callers simply skip it.
+    """
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 threshold: float = 0.92, max_size: int = 1000):
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_size = max_size
+        self._model = None
+        self.enabled = True
+        self._lock = threading.Lock()
+
+        # Slot storage, allocated once the embedding size is known
+        self._vectors: Optional[np.ndarray] = None
+        self._keys: List[Hashable] = []
+        self._values: List[Any] = []
+        self._last_used = np.zeros(max_size, dtype=np.int64)
+        self._clock = 0
+
+    def _encoder(self):
+        """Load the sentence-transformers model on first use"""
+        if self._model is None:
+            # Concurrent first calls (e.g. asyncio.to_thread) must not load it twice
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Normalized embedding of a question (None if the cache is disabled)"""
+        if not self.enabled:
+            return None
+        try:
+            encoder = self._encoder()
+        except (ImportError, OSError) as e:
+            logger.warning("⚠️ Semantic cache disabled, could not load %s: %s", self.model_name, e)
+            self.enabled = False
+            return None
+        embedding = encoder.encode(text, normalize_embeddings=True)
+        return np.asarray(embedding, dtype=np.float32)
+
+    def get(self, embedding: np.ndarray, key: Hashable = None) -> Optional[Any]:
+        """
+        Most similar cached value with the same key, if similar enough
+
+        Args:
+            embedding: Question embedding from embed()
+            key: Exact-match key the cached entry must also have
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        with self._lock:
+            if not self._keys:
+                return None
+            similarities = self._vectors[:len(self._keys)] @ embedding
+            same_key = np.fromiter((k == key for k in self._keys), dtype=bool, count=len(self._keys))
+            similarities[~same_key] = -1.0
+
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            self._clock += 1
+            self._last_used[best] = self._clock
+            return self._values[best]
+
+    def put(self, embedding: np.ndarray, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, embedding.shape[0]), dtype=np.float32)
+
+            if len(self._keys) < self.max_size:
+                slot = len(self._keys)
+                self._keys.append(key)
+                self._values.append(value)
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._keys[slot] = key
+                self._values[slot] = value
+
+            self._vectors[slot] = embedding
+            self._clock += 1
+            self._last_used[slot] = self._clock
+
+    def clear(self):
+        """Remove all cached entries"""
+        with self._lock:
+            self._keys.clear()
+            self._values.clear()
+            self._last_used[:] = 0
@@ -4,41 +4,150 @@ Handles all interactions with Statistics Norway's open data API
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import logging
+import hashlib
+import orjson
+import diskcache
 from typing import Dict, List, Optional, Any
 import time
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# Precomputed Table 10235 results shipped with the repo
+SNAPSHOT_DIR = Path(__file__).parent / "snapshots"
+
+
 class SSBApi:
     """Wrapper for Statistics Norway API"""
     
-    def __init__(self, base_url: str = "https://data.ssb.no/api/v0", cache_dir: str = "data/ssb_cache"):
+    def __init__(self, base_url: str = "https://data.ssb.no/api/v0", cache_dir: str = "data/ssb_cache",
+                 cache_ttl: Optional[float] = 30 * 86400, use_snapshot: bool = True):
         self.base_url = base_url
+        # Serve years with a bundled snapshot (see build_ssb_snapshot.py) without any request
+        self.use_snapshot = use_snapshot
+        # Parsed all-categories results per year (see get_all_categories / refresh)
+        self._categories_by_year: Dict[str, Dict[str, Dict[str, Any]]] = {}
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
+        # One SQLite-backed store for all queries. Entries older than cache_ttl
+        # seconds are revalidated with SSB (ETag / Last-Modified) before reuse.
+        self.cache_ttl = cache_ttl
+        self.cache = diskcache.Cache(str(self.cache_dir), size_limit=128 * 1024 * 1024)
+        
+        # Reuse one keep-alive connection pool for all requests to SSB.
+        # Table queries are read-only POSTs, so they are safe to retry too.
+        retry = Retry(total=3, backoff_factor=0.3,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET", "POST"))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        
     def _get_cache_path(self, table_id: str, query_hash: str) -> Path:
-        """Generate cache file path"""
+        """Path of a one-file-per-query cache entry (BLAKE2b-named, pre-diskcache)"""
         return self.cache_dir / f"{table_id}_{query_hash}.json"
     
-    def _load_from_cache(self, cache_path: Path) -> Optional[Dict]:
-        """Load data from cache if exists"""
-        if cache_path.exists():
-            with open(cache_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+    def _load_from_cache(self, table_id: str, query_hash: str) -> Optional[Dict]:
+        """
+        Load a cache entry if present (migrating BLAKE2b-named per-query JSON files)
+        
+        Returns:
+            Dictionary with 'payload', the response validators ('etag',
+            'last_modified') and 'fetched_at', or None on a miss
+        """
+        key = f"{table_id}:{query_hash}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            entry = orjson.loads(cached)
+            # Entries written before validators were stored hold the bare payload
+            return entry if "payload" in entry else {"payload": entry}
+        
+        legacy_path = self._get_cache_path(table_id, query_hash)
+        if legacy_path.exists():
+            with open(legacy_path, 'rb') as f:
+                data = orjson.loads(f.read())
+            self._save_to_cache(table_id, query_hash, data)
+            return self._load_from_cache(table_id, query_hash)
         return None
     
-    def _save_to_cache(self, cache_path: Path, data: Dict):
-        """Save data to cache"""
-        with open(cache_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def _save_to_cache(self, table_id: str, query_hash: str, data: Dict,
+                       etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Save data and its response validators to cache as compact JSON bytes"""
+        entry = {
+            "payload": data,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        }
+        self.cache.set(f"{table_id}:{query_hash}", orjson.dumps(entry))
+    
+    def _is_fresh(self, entry: Dict) -> bool:
+        """Whether a cache entry can be used without asking SSB"""
+        if self.cache_ttl is None or "fetched_at" not in entry:
+            return True
+        return time.time() - entry["fetched_at"] < self.cache_ttl
+    
+    def _cached_request(self, method: str, url: str, table_id: str, query_hash: str,
+                        use_cache: bool = True, headers: Optional[Dict] = None, **kwargs) -> Dict:
+        """
+        Send a request through the cache, revalidating stale entries
+        
+        A stale entry is sent back with If-None-Match / If-Modified-Since; on
+        304 Not Modified its payload is reused without downloading it again.
+        If SSB cannot be reached, the stale payload is returned as is.
+        Without a cached entry, raises requests.RequestException on failure, or
+        orjson.JSONDecodeError if SSB answers with a body that is not JSON.
+        """
+        entry = self._load_from_cache(table_id, query_hash) if use_cache else None
+        if entry and self._is_fresh(entry):
+            logger.debug("✅ Loaded from cache: %s", table_id)
+            return entry["payload"]
+        
+        headers = dict(headers or {})
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        
+        logger.debug("🔍 Querying SSB table %s...", table_id)
+        try:
+            response = self.session.request(method, url, headers=headers, timeout=10, **kwargs)
+            
+            if entry and response.status_code == 304:
+                logger.debug("✅ Not modified, reusing cache: %s", table_id)
+                self._save_to_cache(table_id, query_hash, entry["payload"],
+                                    entry.get("etag"), entry.get("last_modified"))
+                return entry["payload"]
+            
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            if not entry:
+                raise
+            # SSB unreachable: a stale answer beats none (the entry is retried next time)
+            logger.warning("⚠️ Could not revalidate %s, using stale cache: %s", table_id, e)
+            return entry["payload"]
+        
+        # Save to cache
+        if use_cache:
+            self._save_to_cache(table_id, query_hash, data,
+                                response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            logger.debug("💾 Saved to cache: %s", table_id)
+        
+        return data
     
-    def get_table_metadata(self, table_id: str) -> Dict:
+    def get_table_metadata(self, table_id: str, use_cache: bool = True) -> Dict:
         """
         Get metadata about a table
         
         Args:
             table_id: SSB table ID (e.g., "10235" for household budget)
+            use_cache: Whether to use cached results
         
         Returns:
             Dictionary with table metadata
@@ -46,11 +155,9 @@ class SSBApi:
         url = f"{self.base_url}/en/table/{table_id}"
         
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching metadata for table {table_id}: {e}")
+            return self._cached_request("GET", url, table_id, "metadata", use_cache=use_cache)
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            logger.warning("Error fetching metadata for table %s: %s", table_id, e)
             return {}
     
     def query_table(self, table_id: str, query: Dict, use_cache: bool = True) -> Optional[Dict]:
@@ -65,38 +172,19 @@ class SSBApi:
         Returns:
             Query results as dictionary
         """
-        # Generate cache key
+        # Generate cache key (hash() is salted per process, so use a stable digest)
         query_str = json.dumps(query, sort_keys=True)
-        query_hash = str(hash(query_str))
-        cache_path = self._get_cache_path(table_id, query_hash)
+        query_hash = hashlib.blake2b(query_str.encode("utf-8"), digest_size=16).hexdigest()
         
-        # Check cache first
-        if use_cache:
-            cached_data = self._load_from_cache(cache_path)
-            if cached_data:
-                print(f"✅ Loaded from cache: {table_id}")
-                return cached_data
-        
-        # Make API request
+        # Make API request (served from cache when fresh)
         url = f"{self.base_url}/en/table/{table_id}"
         headers = {'Content-Type': 'application/json'}
         
         try:
-            print(f"🔍 Querying SSB table {table_id}...")
-            response = requests.post(url, json=query, headers=headers)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Save to cache
-            if use_cache:
-                self._save_to_cache(cache_path, data)
-                print(f"💾 Saved to cache: {table_id}")
-            
-            return data
-            
-        except requests.RequestException as e:
-            print(f"❌ Error querying table {table_id}: {e}")
+            return self._cached_request("POST", url, table_id, query_hash, use_cache=use_cache,
+                                        headers=headers, json=query)
+        except (requests.RequestException, orjson.JSONDecodeError) as e:
+            logger.warning("❌ Error querying table %s: %s", table_id, e)
             return None
     
     def get_household_budget_data(self, 
@@ -159,6 +247,54 @@ class SSBApi:
         
         return self.query_table(table_id, query)
     
+    def get_all_categories(self, year: str = "2012") -> Dict[str, Dict[str, Any]]:
+        """
+        Get all main spending categories (01-12) for a year in a single request
+        
+        The parsed result is memoized per year on this instance, so tools that
+        need one, two or all categories share one SSB response.
+        
+        Args:
+            year: Year of data (default: "2012")
+        
+        Returns:
+            Dictionary mapping category code to its parsed item
+            (empty if the data could not be retrieved)
+        """
+        categories = self._categories_by_year.get(year)
+        if categories is None:
+            categories = self._fetch_all_categories(year)
+            # Failures are not memoized, so a later call tries again
+            if categories:
+                self._categories_by_year[year] = categories
+        return categories
+    
+    def refresh(self):
+        """Forget memoized categories so the next lookup reads the cache or SSB again"""
+        self._categories_by_year.clear()
+    
+    @staticmethod
+    def snapshot_path(year: str) -> Path:
+        """Path of the bundled all-categories snapshot for a year"""
+        return SNAPSHOT_DIR / f"10235_{year}.json"
+    
+    def _load_snapshot(self, year: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Load the bundled snapshot for a year if one exists"""
+        path = self.snapshot_path(year)
+        if self.use_snapshot and path.exists():
+            with open(path, 'rb') as f:
+                return orjson.loads(f.read())
+        return None
+    
+    def _fetch_all_categories(self, year: str) -> Dict[str, Dict[str, Any]]:
+        """Load (snapshot) or fetch and parse all main categories, empty on failure"""
+        snapshot = self._load_snapshot(year)
+        if snapshot:
+            return snapshot
+        
+        parsed = self.parse_household_data(self.get_household_budget_data(year=year))
+        return {item['category_code']: item for item in parsed}
+    
     def parse_household_data(self, raw_data: Dict) -> List[Dict[str, Any]]:
         """
         Parse JSON-stat format household data into simple list
@@ -191,7 +327,8 @@ class SSBApi:
             
             results = []
             
-            # Map each value to its category
+            # Map each value to its category (a plain loop: with ~12 codes this
+            # is faster than building NumPy arrays for a vectorized gather)
             for category_code, category_label in forbruk_labels.items():
                 # Find the index for this category
                 idx = forbruk_index.get(category_code)
@@ -201,7 +338,7 @@ class SSBApi:
                         results.append({
                             'category': category_label,
                             'category_code': category_code,
-                            'value': val,
+                            'value': float(val),
                             'year': year,
                             'unit': 'NOK per year'
                         })
@@ -209,9 +346,8 @@ class SSBApi:
             return results
             
         except Exception as e:
-            print(f"❌ Error parsing data: {e}")
-            import traceback
-            traceback.print_exc()
+            # Full traceback only when debugging
+            logger.warning("❌ Error parsing data: %s", e, exc_info=logger.isEnabledFor(logging.DEBUG))
             return []
 
 
@@ -252,4 +388,5 @@ def test_ssb_api():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
     test_ssb_api()
\ No newline at end of file